@@ -0,0 +1,60 @@
+"""Add FTS5 search_index with sync triggers
+
+Revision ID: 2e5a8c1f7b93
+Revises: 1c7d4e9b3f20
+Create Date: 2026-10-18 21:06:12.587304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e5a8c1f7b93'
+down_revision = '1c7d4e9b3f20'
+branch_labels = None
+depends_on = None
+
+# Not autogenerated: Alembic does not know about virtual tables or triggers.
+# Mirrors SEARCH_SOURCES / search_index_ddl() in app.py at the time of this revision.
+# Note that a batch_alter_table "move and copy" of one of these tables drops its triggers;
+# recreate them (and run 'flask rebuild-search-index') in such a migration.
+SOURCES = (
+    # table, rowid code, title column, body column, kind
+    ('medical_history', 1, 'condition', 'notes', 'medical_history'),
+    ('medicine', 2, 'name', None, 'medicine'),
+    ('habit', 3, 'habit_name', 'notes', 'habit'),
+    ('planner_entry', 4, 'event_name', 'notes', 'planner'),
+    ('meal_plan_entry', 5, 'food_item', None, 'meal'),
+)
+
+
+def _row_sql(source, code, title, body, kind):
+    body = f'{source}.{body}' if body else 'NULL'
+    return f"{source}.id * 8 + {code}, {source}.{title}, {body}, 'u' || {source}.user_id, '{kind}', {source}.id"
+
+
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, owner, kind UNINDEXED, item_id UNINDEXED, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    for table, code, title, body, kind in SOURCES:
+        columns = ', '.join(column for column in (title, body, 'user_id') if column)
+        add = (f"INSERT INTO search_index (rowid, title, body, owner, kind, item_id) "
+               f"VALUES ({_row_sql('NEW', code, title, body, kind)});")
+        remove = f"DELETE FROM search_index WHERE rowid = OLD.id * 8 + {code};"
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {add} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {columns} ON {table} "
+                   f"BEGIN {remove} {add} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {remove} END")
+        op.execute(f"INSERT INTO search_index (rowid, title, body, owner, kind, item_id) "
+                   f"SELECT {_row_sql(table, code, title, body, kind)} FROM {table}")
+
+
+def downgrade():
+    for table, code, title, body, kind in SOURCES:
+        for action in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{action}")
+    op.execute("DROP TABLE IF EXISTS search_index")